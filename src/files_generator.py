@@ -1,38 +1,60 @@
-import string
 import dataclasses
 import subprocess
 import os
 import re
-from .generated_devices_props_extractor import QEMUGeneratedDevicePropertiesExtractor
-
-@dataclasses.dataclass
+import functools
+from .generated_devices_props_extractor import parse_property_line
+
+_NON_ALPHANUMERIC_RE = re.compile(r"[^0-9a-zA-Z]+")
+# Section header line followed by its device lines, sections are separated by blank lines
+_DEVICES_SECTION_RE = re.compile(r'^[ \t]*(\S[^\r\n]*)(?:\r?\n|\Z)((?:[ \t]*\S[^\r\n]*(?:\r?\n|\Z))*)', re.MULTILINE)
+_DEVICE_PROPERTY_FIELDS = {
+    'name': 'name',
+    'bus': 'bus',
+    'desc': 'description',
+    'alias': 'alias',
+}
+
+@functools.lru_cache(maxsize=None)
+def _change_to_fit_enum(string: str) -> str:
+    string = _NON_ALPHANUMERIC_RE.sub("_", string).upper()
+    if str(string[0]).isnumeric():
+        string = "_" + string
+    return string
+
+@functools.lru_cache(maxsize=None)
+def _change_to_class_name(section: str) -> str:
+    section = section.replace('devices', '')
+    return _NON_ALPHANUMERIC_RE.sub("", section)
+
+@dataclasses.dataclass(slots=True)
 class _QEMUGeneratedDevice:
     name: str = ""
     description: str | None = None
     bus: str | None = None
     alias: str | None = None
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class _QEMUGeneratedDevicesSection:
     section_name: str
     devices: list[_QEMUGeneratedDevice]
 
 class QEMUFilesGenerator:
+    # Bump whenever templates or parsing change, so stamped device files get regenerated
+    _GENERATOR_VERSION = 1
+    _FIELD_INDENT = "    "
     _BUS_ENUM_CLASS_NAME = "QEMUDeviceBusType"
     _BUS_ENUM_FIELDS_TEMPLATE_KEY = "bus_enum_fields"
-    _BUS_FILE_TEMPLATE = string.Template(f"""
+    _BUS_FILE_TEMPLATE = f"""
 import enum
 
 class {_BUS_ENUM_CLASS_NAME}(enum.Enum): 
-${_BUS_ENUM_FIELDS_TEMPLATE_KEY}
-
-    def __init__(self, name: str):
-        self.__name: str = name
+{{{_BUS_ENUM_FIELDS_TEMPLATE_KEY}}}
 
     def to_qemu_string(self) -> str:
-        return self.__name
+        return self.value
 
-""")
+"""
 
     _BASE_DEVICE_FILE_TEMPLATE = """
 class QEMUDevice(enum.Enum):
@@ -46,19 +68,19 @@ class QEMUDevice(enum.Enum):
         return self.__name
 
     def has_bus(self) -> bool:
-        return self.__bus != None
+        return self.__bus is not None
 
     def get_bus(self) -> QEMUDeviceBusType | None:
         return self.__bus
 
     def has_description(self) -> bool:
-        return self.__description != None
+        return self.__description is not None
 
     def get_description(self) -> str | None:
         return self.__description
 
     def has_alias(self) -> bool:
-        return self.__alias != None
+        return self.__alias is not None
 
     def get_alias(self) -> str | None:
         return self.__alias    
@@ -66,120 +88,108 @@ class QEMUDevice(enum.Enum):
 
     _DEVICE_ENUM_CLASS_TEMPLATE_KEY = "device_enum_class_name"
     _DEVICE_ENUM_FIELDS_TEMPLATE_KEY = "device_enum_fields"
-    _DEVICES_FILE_TEMPLATE = string.Template(f"""
+    _DEVICES_FILE_TEMPLATE = f"""
 
-class ${_DEVICE_ENUM_CLASS_TEMPLATE_KEY}(QEMUDevice):
-${_DEVICE_ENUM_FIELDS_TEMPLATE_KEY}
+class {{{_DEVICE_ENUM_CLASS_TEMPLATE_KEY}}}(QEMUDevice):
+{{{_DEVICE_ENUM_FIELDS_TEMPLATE_KEY}}}
 
     def __init__(self, name: str, description: str | None, bus: QEMUDeviceBusType | None, alias: str | None):
         super().__init__(name, description, bus, alias)
 
-""")
+"""
 
     def __init__(self, qemu_path: str):
         self.__qemu_path = os.path.realpath(qemu_path)
 
     def _extract_devices(self) -> list[_QEMUGeneratedDevicesSection]:
         output = subprocess.check_output([self.__qemu_path, '-device', 'help'])
-        lines = output.decode('utf-8').splitlines(False)
-        
-        current_section: _QEMUGeneratedDevicesSection | None = None
+
         generated_sections: list[_QEMUGeneratedDevicesSection] = []
 
-        for line in lines:
-            if len(line.strip()) == 0:
-                current_section = None
-                continue
-
-            if current_section == None:
-                current_section = _QEMUGeneratedDevicesSection(line, [])
-                generated_sections.append(current_section)
-                continue
-
-            device = _QEMUGeneratedDevice()
-            properties = QEMUGeneratedDevicePropertiesExtractor(line.strip()).run()
-            for key, value in properties.items():
-                if key.startswith('name'):
-                    device.name = value
-                elif key.startswith('bus'):
-                    device.bus = value
-                elif key.startswith('desc'):
-                    device.description = value
-                elif key.startswith('alias'):
-                    device.alias = value
-                else:
-                    raise Exception(f"Unrecognized device format: {(key, value)}")
-
-            if device.name == "":
-                raise Exception(f"device_name property None")
-            
-            current_section.devices.append(device)
+        for section_match in _DEVICES_SECTION_RE.finditer(output.decode('utf-8')):
+            section = _QEMUGeneratedDevicesSection(section_match.group(1), [])
+            generated_sections.append(section)
 
-        return generated_sections
+            for line in section_match.group(2).splitlines(False):
+                device = _QEMUGeneratedDevice()
+                properties = parse_property_line(line.strip())
+                for key, value in properties.items():
+                    field_name = _DEVICE_PROPERTY_FIELDS.get(key)
+                    if field_name is None:
+                        raise Exception(f"Unrecognized device format: {(key, value)}")
+                    setattr(device, field_name, value)
 
-    def _change_to_fit_enum(self, string: str):
-        string = re.sub("[^0-9a-zA-Z]+", "_", string).upper()
-        if str(string[0]).isnumeric():
-            string = "_" + string
-        return string
+                if device.name == "":
+                    raise Exception(f"device_name property None")
 
-    def _change_to_class_name(self, section: str):
-        section = section.replace('devices', '')
-        return re.sub("[^0-9a-zA-Z]+", "", section)
-
-    def _generate_bus_file_text(self, devices_sections: list[_QEMUGeneratedDevicesSection]) -> str:
-        buses = set()
-        for section in devices_sections:
-            for device in section.devices:
-                if device.bus != None:
-                    buses.add(device.bus)
-        
-        buses_enum_fields = {}
-        for bus in buses:
-            buses_enum_fields[bus] = self._change_to_fit_enum(bus)
+                section.devices.append(device)
 
-        field_spaces = ''.join([' '] * 4)
+        return generated_sections
 
-        bus_fields = []
-        for bus_name, bus_enum_name in buses_enum_fields.items():
-            bus_fields.append(f'{field_spaces}{bus_enum_name} = ("{bus_name}")')
+    def _generate_bus_file_text(self, devices_sections: list[_QEMUGeneratedDevicesSection]) -> str:
+        buses = {
+            device.bus
+            for section in devices_sections
+            for device in section.devices
+            if device.bus is not None
+        }
+        buses_enum_fields = {bus: _change_to_fit_enum(bus) for bus in buses}
+
+        bus_fields = [
+            f'{self._FIELD_INDENT}{bus_enum_name} = ("{bus_name}")'
+            for bus_name, bus_enum_name in buses_enum_fields.items()
+        ]
         
-        return self._BUS_FILE_TEMPLATE.substitute({
+        return self._BUS_FILE_TEMPLATE.format_map({
             self._BUS_ENUM_FIELDS_TEMPLATE_KEY: '\n'.join(bus_fields)
         })
 
-    def _generate_devices_file_text(self, devices_sections: list[_QEMUGeneratedDevicesSection]) -> str:
-        
-        field_spaces = ''.join([' '] * 4)
+    def _generate_device_enum_field(self, device: _QEMUGeneratedDevice) -> str:
+        device_name = _change_to_fit_enum(device.name)
+        device_desc = "None" if device.description is None else f'"{device.description}"'
+        device_bus = "None" if device.bus is None else f'{self._BUS_ENUM_CLASS_NAME}.{_change_to_fit_enum(device.bus)}'
+        device_alias = "None" if device.alias is None else f'"{device.alias}"'
+        return f'{self._FIELD_INDENT}{device_name} = ("{device.name}", {device_desc}, {device_bus}, {device_alias})'
 
-        class_text = self._BASE_DEVICE_FILE_TEMPLATE
+    def _generate_devices_file_text(self, devices_sections: list[_QEMUGeneratedDevicesSection]) -> str:
+        parts = [self._BASE_DEVICE_FILE_TEMPLATE]
         for section in devices_sections:
-            tuple_lines = []
-            section_name = self._change_to_class_name(section.section_name)
+            section_name = _change_to_class_name(section.section_name)
             class_name = f'QEMU{section_name}Device'
-            for device in section.devices:
-                device_name = self._change_to_fit_enum(device.name)
-                device_desc = "None" if device.description == None else f'"{device.description}"'
-                device_bus = "None" if device.bus == None else f'{self._BUS_ENUM_CLASS_NAME}.{self._change_to_fit_enum(device.bus)}'
-                device_alias = "None" if device.description == None else f'"{device.alias}"'
-                tuple_lines.append(f'{field_spaces}{device_name} = ("{device.name}", {device_desc}, {device_bus}, {device_alias})')
-
-            class_text += self._DEVICES_FILE_TEMPLATE.substitute({
+            tuple_lines = list(map(self._generate_device_enum_field, section.devices))
+
+            parts.append(self._DEVICES_FILE_TEMPLATE.format_map({
                 self._DEVICE_ENUM_CLASS_TEMPLATE_KEY: class_name,
                 self._DEVICE_ENUM_FIELDS_TEMPLATE_KEY: '\n'.join(tuple_lines)
-            })
+            }))
+
+        return ''.join(parts)
 
-        return class_text
+    def _is_devices_file_up_to_date(self, output_file_path: str, stamp_file_path: str, stamp: str) -> bool:
+        if not os.path.isfile(output_file_path) or not os.path.isfile(stamp_file_path):
+            return False
+        with open(stamp_file_path, "r") as file:
+            return file.read() == stamp
 
-    def generate_devices_file(self, output_file_path: str | None = None):
-        if output_file_path == None:
+    def generate_devices_file(self, output_file_path: str | None = None, force: bool = False):
+        if output_file_path is None:
             script_dir = os.path.realpath(os.path.dirname(__file__))
             output_file_path = f"{script_dir}/qemu_devices.py"
 
+        # Skip regeneration until the qemu binary or this generator changes. Separately installed
+        # qemu device modules are not tracked, callers pass force to pick them up
+        stamp_file_path = f"{output_file_path}.stamp"
+        stamp = f"{self._GENERATOR_VERSION}:{self.__qemu_path}:{os.stat(self.__qemu_path).st_mtime_ns}"
+        if not force and self._is_devices_file_up_to_date(output_file_path, stamp_file_path, stamp):
+            return
+
         devices_sections = self._extract_devices()
         bus_file_text = self._generate_bus_file_text(devices_sections)
         devices_file_text = self._generate_devices_file_text(devices_sections)
 
         with open(output_file_path, "w") as file:
             file.write(bus_file_text)
-            file.write(devices_file_text)
\ No newline at end of file
+            file.write(devices_file_text)
+
+        with open(stamp_file_path, "w") as file:
+            file.write(stamp)
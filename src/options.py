@@ -1,9 +1,11 @@
 
 import os
+import shlex
+import subprocess
 import dataclasses
 import enum
+from typing import ClassVar
 
-from qemu_devices import QEMUDevice, QEMUStorageDevice
 class _QEMUDriveInterface(enum.Enum):
     IDE = ("ide")
     SCSI = ("scsi")
@@ -14,40 +16,34 @@ class _QEMUDriveInterface(enum.Enum):
     VIRTIO = ("virtio")
     NONE = ("none")
 
-    def __init__(self, name: str):
-        self.__name: str = name
-
     def to_qemu_string(self) -> str:
-        return self.__name
+        return self.value
         
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class _QEMUDrive:
     file_path: str
     id: str
+    media: ClassVar[str]
+    device: ClassVar[str]
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class _QEMUCDRom(_QEMUDrive):
-    pass
-@dataclasses.dataclass
+    media: ClassVar[str] = "cdrom"
+    device: ClassVar[str] = "ide-cd"
+
+@dataclasses.dataclass(slots=True, frozen=True)
 class _QEMUHardDrive(_QEMUDrive):
-    pass
+    media: ClassVar[str] = "disk"
+    device: ClassVar[str] = "ide-hd"
 
 class _QEMURamUnit(enum.Enum):
-    MEGABYTES = 0
-    GIGABYTES = 1
+    MEGABYTES = ("M")
+    GIGABYTES = ("G")
 
-    def as_string(self):
-        match self:
-            case _QEMURamUnit.MEGABYTES: return "M"
-            case _QEMURamUnit.GIGABYTES: return "G"
-        raise Exception(f"Not recognized unit: {self}")
+    def as_string(self) -> str:
+        return self.value
 
-@dataclasses.dataclass
-class _QEMURamSize:
-    amount: int
-    unit: _QEMURamUnit
-
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class _QEMUBootOrderEntry:
     drive_id: str
     index: int
@@ -62,11 +58,8 @@ class QEMUAccelerationMode(enum.Enum):
     WHPX = ("whpx")
     TCG = ("tcg")
 
-    def __init__(self, name) -> None:
-        self.__name = name
-
     def to_qemu_string(self) -> str:
-        return self.__name
+        return self.value
     
 
 
@@ -75,28 +68,19 @@ class QEMUOptions:
         self.__qemu_path: str = os.path.realpath(qemu_path)
         self.__processor: str | None = None
         self.__cores: int = 1
-        self.__ram_size: _QEMURamSize = _QEMURamSize(512, _QEMURamUnit.MEGABYTES)
-        self.__drives: list[_QEMUDrive] = []
-        self.__acceleration_mode: str | None = None
-        self.__boot_order: list[_QEMUBootOrderEntry] = []
-
-    def _find_drive_with_id(self, id: str) -> _QEMUDrive | None:
-        for drive in self.__drives:
-            if drive.id == id:
-                return drive
-        return None
+        self.__ram_arg: str = f'512{_QEMURamUnit.MEGABYTES.as_string()}'
+        self.__drives: dict[str, _QEMUDrive] = {}
+        self.__acceleration_mode: QEMUAccelerationMode | None = None
+        self.__boot_order: dict[str, _QEMUBootOrderEntry] = {}
 
     def _find_bootorder_for_drive(self, id: str) -> _QEMUBootOrderEntry | None:
-        for order in self.__boot_order:
-            if order.drive_id == id:
-                return order
-        return None
+        return self.__boot_order.get(id)
 
     def _create_id_for_driver(self) -> str:
         DRIVE_ID_FORMAT = "drive_{}"
         drive_id_suffix = len(self.__drives)
         drive_id = DRIVE_ID_FORMAT.format(drive_id_suffix)
-        while self._find_drive_with_id(drive_id) != None:
+        while drive_id in self.__drives:
             drive_id_suffix += 1
             drive_id = DRIVE_ID_FORMAT.format(drive_id_suffix)
         return drive_id
@@ -109,79 +93,59 @@ class QEMUOptions:
     def set_ram_megabytes(self, megabytes: int):
         if megabytes <= 0:
             megabytes = 512
-        self.__ram_size = _QEMURamSize(megabytes, _QEMURamUnit.MEGABYTES)
+        self.__ram_arg = f'{megabytes}{_QEMURamUnit.MEGABYTES.as_string()}'
 
     def set_ram_gigabytes(self, gigabytes: int):
         if gigabytes <= 0:
             gigabytes = 1
-        self.__ram_size = _QEMURamSize(gigabytes, _QEMURamUnit.GIGABYTES)
+        self.__ram_arg = f'{gigabytes}{_QEMURamUnit.GIGABYTES.as_string()}'
 
     def set_acceleration_mode(self, mode: QEMUAccelerationMode):
-        self.__acceleration_mode = mode.to_qemu_string()
+        self.__acceleration_mode = mode
 
     def set_boot_order(self, drive_id: str, index: int):
-        boot_order_set = False
-        for order in self.__boot_order:
-            if order.drive_id == drive_id:
-                order.index = index
-                boot_order_set = True
-                break
-
-        if boot_order_set == False:
-            self.__boot_order.append(_QEMUBootOrderEntry(drive_id, index))
-
-        self.__boot_order.sort(key=lambda order_key: order_key.drive_id)
+        self.__boot_order[drive_id] = _QEMUBootOrderEntry(drive_id, index)
 
     def add_cdrom(self, iso_file: str) -> str:
         iso_file = os.path.realpath(iso_file)
         drive = _QEMUCDRom(iso_file, self._create_id_for_driver())
-        self.__drives.append(drive)
+        self.__drives[drive.id] = drive
         return drive.id
 
     def add_hard_drive(self, image_file: str) -> str:
         image_file = os.path.realpath(image_file)
         drive = _QEMUHardDrive(image_file, self._create_id_for_driver())
-        self.__drives.append(drive)
+        self.__drives[drive.id] = drive
         return drive.id
 
-    def to_command_line(self) -> str:
+    def to_argv(self) -> list[str]:
         command = [self.__qemu_path]
-        for drive in self.__drives:
-            drive_parameters = [
-                f'file="{drive.file_path}"',
-                f'id={drive.id}'
-            ]
-
-            if type(drive) is _QEMUCDRom: 
-                drive_parameters.append(f'media=cdrom,if=none')
-            elif type(drive) is _QEMUHardDrive: 
-                drive_parameters.append(f'media=disk,if=none')
-            else:
-                raise Exception(f"Not recognized drive type: {type(drive)}")
-
-            device_parameters = []
-            if type(drive) is _QEMUCDRom: 
-                device_parameters.append(f'{QEMUStorageDevice.IDE_CD.to_qemu_string()},drive={drive.id}')
-            elif type(drive) is _QEMUHardDrive: 
-                device_parameters.append(f'{QEMUStorageDevice.IDE_HD.to_qemu_string()},drive={drive.id}')
+        find_bootorder_for_drive = self._find_bootorder_for_drive
+        for drive in self.__drives.values():
+            # qemu option values escape ',' by doubling it
+            drive_file = drive.file_path.replace(',', ',,')
+            drive_parameters = f'file={drive_file},id={drive.id},media={drive.media},if=none'
 
+            device_parameters = f'{drive.device},drive={drive.id}'
+            boot_order = find_bootorder_for_drive(drive.id)
+            if boot_order is not None:
+                device_parameters = f'{device_parameters},bootindex={boot_order.index}'
 
-            boot_order = self._find_bootorder_for_drive(drive.id)
-            if boot_order != None:
-                device_parameters.append(f'bootindex={boot_order.index}')
+            command += ("-drive", drive_parameters, "-device", device_parameters)
 
-            command.append(f"-drive {','.join(drive_parameters)}")
-            command.append(f"-device {','.join(device_parameters)}")
+        if self.__processor is not None:
+            command += ("-cpu", self.__processor)
+        command += ("-smp", str(self.__cores))
+        command += ("-m", self.__ram_arg)
 
-            
-
-        if self.__processor != None:
-            command.append(f'-cpu {self.__processor}')
-        command.append(f'-smp {self.__cores}')
-        command.append(f'-m {self.__ram_size.amount}{self.__ram_size.unit.as_string()}')
+        if self.__acceleration_mode is not None:
+            command += ("-accel", self.__acceleration_mode.value)
 
-        if self.__acceleration_mode != None:
-            command.append(f'-accel {self.__acceleration_mode}')
+        return command
 
-        return ' '.join(command)
+    def to_command_line(self) -> str:
+        # cmd.exe does not understand POSIX single quotes
+        if os.name == "nt":
+            return subprocess.list2cmdline(self.to_argv())
+        return shlex.join(self.to_argv())
     
\ No newline at end of file